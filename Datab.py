@@ -19,6 +19,39 @@ def establish_tables():
 			CREATE TABLE IF NOT EXISTS stock_price(id Serial Primary Key, stock_symbol Varchar(15), s_date Date, s_price NUMERIC(10, 2), is_prediction BOOLEAN DEFAULT FALSE)
 			""")
 
+		# Forecast details stored with predicted rows
+		cur.execute("""
+			ALTER TABLE stock_price
+				ADD COLUMN IF NOT EXISTS prob_up FLOAT,
+				ADD COLUMN IF NOT EXISTS price_low NUMERIC(10, 2),
+				ADD COLUMN IF NOT EXISTS price_high NUMERIC(10, 2)
+			""")
+
+		# One row per symbol, day and kind; bulk loads rely on it for ON CONFLICT
+		cur.execute("""
+			DELETE FROM stock_price a USING stock_price b
+			WHERE a.id > b.id AND a.stock_symbol = b.stock_symbol AND a.s_date = b.s_date AND a.is_prediction = b.is_prediction
+			""")
+		cur.execute("""
+			CREATE UNIQUE INDEX IF NOT EXISTS stock_price_symbol_date_key ON stock_price (stock_symbol, s_date, is_prediction)
+			""")
+
+		# One row per trade; loads insert with ON CONFLICT against this key instead of reading the table
+		cur.execute("""
+			DELETE FROM stock_purchases
+			WHERE stock_symbol = 'N/A' OR purchase_price IS NULL OR name = 'N/A' OR purchase_date IS NULL
+			""")
+		cur.execute("""
+			UPDATE stock_purchases SET name = btrim(name) WHERE name <> btrim(name)
+			""")
+		cur.execute("""
+			DELETE FROM stock_purchases a USING stock_purchases b
+			WHERE a.id > b.id AND a.purchase_date = b.purchase_date AND a.stock_symbol = b.stock_symbol AND a.name = b.name
+			""")
+		cur.execute("""
+			CREATE UNIQUE INDEX IF NOT EXISTS stock_purchases_trade_key ON stock_purchases (purchase_date, stock_symbol, name)
+			""")
+
 		cur.close()
 		connection.close()
 	except psycopg2.Error as e:
@@ -0,0 +1,148 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from features import FEATURE_COLUMNS
+from training import N_ESTIMATORS, RANDOM_STATE, MIN_ROWS
+
+N_FOLDS = 5
+TEST_DAYS = 20   # Trading days in each walk-forward test window
+
+
+def walk_forward_folds(n_dates, n_folds = N_FOLDS, test_days = TEST_DAYS):
+    """
+    Return (test_start, test_end) date positions for consecutive test windows.
+
+    The windows tile the last n_folds * test_days dates; training for each
+    fold only ever uses dates before test_start.
+    """
+    first = max(0, n_dates - n_folds * test_days)
+    return [(start, min(start + test_days, n_dates)) for start in range(first, n_dates, test_days)]
+
+
+def _fit_predict(args):
+    """Fit one symbol's fold and predict its test rows (picklable for a process pool)."""
+    X_train, y_train, X_test, n_estimators, n_jobs = args
+    model = RandomForestClassifier(n_estimators = n_estimators, random_state = RANDOM_STATE, n_jobs = n_jobs)
+    model.fit(X_train, y_train)
+    return model.predict(X_test)
+
+
+def score(positions, returns):
+    """
+    Score a dates x symbols position matrix against next-day returns.
+
+    positions holds +1 (long), -1 (short) or 0 (flat); returns holds the
+    return from each date to the next, NaN where unknown. Everything is
+    computed with array operations over all symbols at once. The portfolio
+    is equal weight across the symbols with a position on each date.
+    """
+    returns = np.nan_to_num(returns)
+    pnl = positions * returns
+    active = positions != 0
+
+    n_active = active.sum(axis = 1)
+    daily = np.divide(pnl.sum(axis = 1), n_active, out = np.zeros(len(pnl)), where = n_active > 0)
+    equity = np.cumsum(daily)
+    drawdown = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:] - equity
+
+    traded = active & (returns != 0)
+    hits = (np.sign(positions) == np.sign(returns)) & traded
+    turnover = np.abs(np.diff(positions, axis = 0, prepend = 0)).sum()
+
+    return {
+        "total_return": float(equity[-1]) if len(equity) else 0.0,
+        "hit_rate": float(hits.sum() / traded.sum()) if traded.any() else 0.0,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "turnover": float(turnover / max(1, active.sum())),
+        "sharpe": float(daily.mean() / daily.std() * np.sqrt(252)) if daily.std() > 0 else 0.0,
+        "trades": int(active.sum()),
+    }
+
+
+def backtest(panel, n_estimators = N_ESTIMATORS, horizon = 1, lookback = None,
+             n_folds = N_FOLDS, test_days = TEST_DAYS, workers = 1, n_jobs = 1):
+    """
+    Walk-forward backtest of the per-symbol forest over the whole universe.
+
+    For each fold, every symbol is fit on its rows before the test window
+    (expanding, or only the last lookback dates when lookback is set) and
+    predicts target_<horizon> for the window. Training rows whose target
+    reaches into the test window are purged. The predictions become daily
+    long/short positions that are scored with score().
+
+    workers > 1 runs the per-symbol fits in a process pool; each job only
+    carries that symbol's arrays.
+    """
+    target = f"target_{horizon}"
+    dates = np.sort(panel["s_date"].unique())
+    symbols = panel["stock_symbol"].unique()
+    folds = walk_forward_folds(len(dates), n_folds, test_days)
+
+    date_pos = np.searchsorted(dates, panel["s_date"].to_numpy())
+    symbol_pos = pd.Index(symbols).get_indexer(panel["stock_symbol"])
+    X = panel[FEATURE_COLUMNS].to_numpy(dtype = float)
+    y = panel[target].to_numpy()
+
+    # Next-day return for every row, as a dates x symbols matrix
+    next_price = panel.groupby("stock_symbol", sort = False)["s_price"].shift(-1)
+    returns = np.full((len(dates), len(symbols)), np.nan)
+    returns[date_pos, symbol_pos] = (next_price / panel["s_price"] - 1).to_numpy()
+
+    jobs, cells = [], []
+    for sym in range(len(symbols)):
+        rows = np.flatnonzero(symbol_pos == sym)
+        for start, end in folds:
+            train = rows[(date_pos[rows] < start - horizon) & ~np.isnan(y[rows])]
+            if lookback:
+                train = train[date_pos[train] >= start - horizon - lookback]
+            test = rows[(date_pos[rows] >= start) & (date_pos[rows] < end)]
+            if len(train) < MIN_ROWS or len(test) == 0 or len(np.unique(y[train])) < 2:
+                continue
+            jobs.append((X[train], y[train].astype(int), X[test], n_estimators, n_jobs))
+            cells.append((date_pos[test], sym))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            predictions = list(executor.map(_fit_predict, jobs, chunksize = 8))
+    else:
+        predictions = [_fit_predict(job) for job in jobs]
+
+    positions = np.zeros((len(dates), len(symbols)))
+    for (test_dates, sym), pred in zip(cells, predictions):
+        positions[test_dates, sym] = np.where(pred == 1, 1, -1)
+
+    # Only score the test windows
+    window = slice(folds[0][0], folds[-1][1]) if folds else slice(0, 0)
+    return score(positions[window], returns[window])
+
+
+def sweep(panel, n_estimators = (25, 50, 100), horizons = (1, 7), lookbacks = (None, 120), **kwargs):
+    """Backtest every combination of tree count, horizon and lookback; returns one row per run."""
+    rows = []
+    for trees, horizon, lookback in itertools.product(n_estimators, horizons, lookbacks):
+        metrics = backtest(panel, n_estimators = trees, horizon = horizon, lookback = lookback, **kwargs)
+        rows.append({"n_estimators": trees, "horizon": horizon, "lookback": lookback or "expanding", **metrics})
+        print(f"trees={trees} horizon={horizon} lookback={lookback or 'expanding'}: "
+              f"return {metrics['total_return']:.4f}, hit rate {metrics['hit_rate']:.2f}, "
+              f"drawdown {metrics['max_drawdown']:.4f}")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import os
+    from sqlalchemy import create_engine, text
+    from datetime import timedelta
+    from features import build_features
+    from predict import fetch_benchmarks
+    from keys import HOST, DATABASE, USER, PASSWORD
+
+    engine = create_engine(f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}/{DATABASE}")
+    with engine.connect() as conn:
+        prices_df = pd.read_sql_query(text("SELECT stock_symbol, s_date, s_price FROM stock_price WHERE is_prediction = FALSE"), conn)
+        trades_df = pd.read_sql_query(text("SELECT stock_symbol, purchase_date, purchase_price, name FROM stock_purchases"), conn)
+
+    index_df, sector_df = fetch_benchmarks(prices_df["stock_symbol"].unique(), prices_df["s_date"].min(), prices_df["s_date"].max() + timedelta(days = 1))
+    panel = build_features(prices_df, trades_df, index_df, sector_df)
+    print(sweep(panel, workers = os.cpu_count() or 1).to_string(index = False))
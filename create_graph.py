@@ -13,7 +13,7 @@ def create_graph():
 
 		# Fetch data with pandas and SQLAlchemy
 		query = """
-			SELECT stock_symbol, s_date, s_price, is_prediction
+			SELECT stock_symbol, s_date, s_price, is_prediction, price_low, price_high
 			FROM stock_price
 			ORDER by s_date"""
 		
@@ -52,6 +52,9 @@ def create_graph():
 				pred_prices = pred_data["s_price"].astype(float)
 				plt.plot(pred_dates, pred_prices, label = f"{symbol} Predicted", color = "orange", ls = "--")
 				plt.scatter(pred_dates, pred_prices, color = "orange", s = 10)
+				if pred_data["price_low"].notna().all():
+					plt.fill_between(pred_dates, pred_data["price_low"].astype(float), pred_data["price_high"].astype(float),
+						color = "orange", alpha = 0.2, label = "80% band")
 
 				# Format
 				ax = plt.gca()
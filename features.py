@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+# Look-back windows (in days) used for the distinct-buyer features
+BUYER_WINDOWS = (7, 30, 45)
+VOLUME_WINDOW = 30
+ROLLING_WINDOW = 30   # Rows used for the rolling price and index features
+TARGET_HORIZON = 7    # Furthest horizon (in rows) with an up/down target
+HORIZONS = range(1, TARGET_HORIZON + 1)
+
+PRICE_FEATURES = ["avg_price", "price_std", "price_diff_5", "price_diff_10"]
+INDEX_NAMES = ("sp500", "nasdaq")   # <name>_price columns of the market index frame
+MARKET_FEATURES = ["sp500_diff_5", "sp500_diff_10", "sp500_ma_30", "nasdaq_diff_5", "nasdaq_diff_10"]
+RELATIVE_FEATURES = ["rs_sp500_10", "rs_sector_10"]
+TRADE_FEATURES = ["trade_count"] + [f"buyers_{w}d" for w in BUYER_WINDOWS] + [f"purchase_volume_{VOLUME_WINDOW}d", "days_since_purchase"]
+FEATURE_COLUMNS = PRICE_FEATURES + MARKET_FEATURES + RELATIVE_FEATURES + TRADE_FEATURES
+TARGET_COLUMNS = [f"target_{h}" for h in HORIZONS]
+
+
+def _as_datetime(values):
+    """Normalize a date column to datetime64[ns] so as-of joins line up."""
+    return pd.to_datetime(values).astype("datetime64[ns]")
+
+
+def _asof(left, right, left_on, value_cols):
+    """Backward as-of join of right's value columns onto left, matched per stock_symbol."""
+    merged = pd.merge_asof(
+        left.sort_values(left_on), right.sort_values("event_date"),
+        left_on = left_on, right_on = "event_date", by = "stock_symbol", direction = "backward")
+    return merged.set_index("row_id")[value_cols].reindex(left["row_id"]).reset_index(drop = True)
+
+
+def _active_buyer_events(trades, window):
+    """
+    Turn purchases into +1/-1 events so a running sum gives the number of
+    distinct buyers with a purchase in the trailing window.
+
+    A purchase on day p keeps its buyer active on [p, p + window). Purchases by
+    the same buyer closer together than the window are merged into a single
+    interval first, so each buyer is counted once no matter how often they buy.
+    """
+    buys = trades.dropna(subset = ["name"]).drop_duplicates(["stock_symbol", "name", "purchase_date"])
+    buys = buys.sort_values(["stock_symbol", "name", "purchase_date"])
+    span = pd.Timedelta(days = window)
+
+    same_buyer = (buys["stock_symbol"].eq(buys["stock_symbol"].shift())
+                  & buys["name"].eq(buys["name"].shift()))
+    gap = buys["purchase_date"].diff()
+    interval_id = (~same_buyer | (gap >= span)).cumsum()
+
+    intervals = buys.groupby(interval_id).agg(
+        stock_symbol = ("stock_symbol", "first"), start = ("purchase_date", "min"), end = ("purchase_date", "max"))
+    intervals["end"] = intervals["end"] + span
+
+    events = pd.concat([
+        pd.DataFrame({"stock_symbol": intervals["stock_symbol"], "event_date": intervals["start"], "delta": 1}),
+        pd.DataFrame({"stock_symbol": intervals["stock_symbol"], "event_date": intervals["end"], "delta": -1}),
+    ])
+    events = events.groupby(["stock_symbol", "event_date"], as_index = False)["delta"].sum()
+    events["active"] = events.groupby("stock_symbol")["delta"].cumsum()
+    return events[["stock_symbol", "event_date", "active"]]
+
+
+def add_trade_features(prices_df, trades_df):
+    """
+    Add congressional trade features to every price row in one pass.
+
+    Trades are reduced to per-symbol cumulative series and joined onto the
+    prices with sorted as-of joins, so the cost is roughly linear in
+    len(prices_df) + len(trades_df) instead of re-filtering the trades for
+    every price row.
+
+    Columns added (see TRADE_FEATURES):
+        trade_count            purchases on or before s_date
+        buyers_<N>d            distinct buyers with a purchase in the last N days
+        purchase_volume_30d    sum of purchase prices in the last 30 days
+        days_since_purchase    days since the latest purchase, -1 if none yet
+    """
+    prices_df = prices_df.copy()
+    keys = pd.DataFrame({
+        "row_id": range(len(prices_df)),
+        "stock_symbol": prices_df["stock_symbol"].to_numpy(),
+        "s_date": _as_datetime(prices_df["s_date"]).to_numpy(),
+    })
+
+    trades = trades_df[trades_df["stock_symbol"].isin(keys["stock_symbol"].unique())].copy()
+    trades["purchase_date"] = _as_datetime(trades["purchase_date"])
+    trades = trades.dropna(subset = ["purchase_date"])
+
+    if trades.empty:
+        for col in TRADE_FEATURES:
+            prices_df[col] = 0
+        prices_df["days_since_purchase"] = -1
+        return prices_df
+
+    # Cumulative trade count and dollar volume as of each purchase date
+    daily = (trades.assign(purchase_price = pd.to_numeric(trades["purchase_price"], errors = "coerce").fillna(0))
+             .groupby(["stock_symbol", "purchase_date"], as_index = False)
+             .agg(trades = ("purchase_price", "size"), volume = ("purchase_price", "sum")))
+    daily["cum_trades"] = daily.groupby("stock_symbol")["trades"].cumsum()
+    daily["cum_volume"] = daily.groupby("stock_symbol")["volume"].cumsum()
+    daily["last_purchase"] = daily["purchase_date"]
+    daily = daily.rename(columns = {"purchase_date": "event_date"})
+
+    now = _asof(keys, daily, "s_date", ["cum_trades", "cum_volume", "last_purchase"])
+    keys["volume_cutoff"] = keys["s_date"] - pd.Timedelta(days = VOLUME_WINDOW)
+    before = _asof(keys, daily, "volume_cutoff", ["cum_volume"])
+
+    prices_df["trade_count"] = now["cum_trades"].fillna(0).astype(int).to_numpy()
+    for window in BUYER_WINDOWS:
+        active = _asof(keys, _active_buyer_events(trades, window), "s_date", ["active"])
+        prices_df[f"buyers_{window}d"] = active["active"].fillna(0).astype(int).to_numpy()
+    prices_df[f"purchase_volume_{VOLUME_WINDOW}d"] = (now["cum_volume"].fillna(0) - before["cum_volume"].fillna(0)).to_numpy()
+    prices_df["days_since_purchase"] = (keys["s_date"] - now["last_purchase"]).dt.days.fillna(-1).astype(int).to_numpy()
+
+    return prices_df
+
+
+def add_price_features(panel):
+    """Add per-symbol pct_change and rolling mean/std features with grouped, vectorized operations."""
+    prices = panel.groupby("stock_symbol", sort = False)["s_price"]
+
+    panel["price_diff_5"] = prices.pct_change(5).fillna(0)
+    panel["price_diff_10"] = prices.pct_change(10).fillna(0)
+    panel["avg_price"] = prices.rolling(ROLLING_WINDOW, min_periods = 1).mean().reset_index(level = 0, drop = True)
+    panel["price_std"] = prices.rolling(ROLLING_WINDOW).std().reset_index(level = 0, drop = True).fillna(0)
+    return panel
+
+
+def add_market_features(panel, sp500_df):
+    """
+    Add market index features, computed once on each index series and joined on date.
+
+    sp500_df holds s_date and a <name>_price column per index in INDEX_NAMES
+    (sp500_price is enough; missing indexes yield zeros). Each price row takes
+    the latest index values on or before its date, so gaps in an index
+    (holidays, partial downloads) carry the previous close forward without
+    leaking values between symbols. Missing index data yields zeros.
+    """
+    if sp500_df is None or sp500_df.empty:
+        for col in MARKET_FEATURES:
+            panel[col] = 0.0
+        panel["sp500_price"] = float("nan")
+        return panel
+
+    index = sp500_df.reindex(columns = ["s_date"] + [f"{name}_price" for name in INDEX_NAMES])
+    index["s_date"] = _as_datetime(index["s_date"])
+    index = index.dropna(subset = ["s_date"]).sort_values("s_date").drop_duplicates("s_date")
+    for name in INDEX_NAMES:
+        # Each index is differenced over its own trading days, then carried forward
+        closes = index[f"{name}_price"].dropna()
+        index[f"{name}_diff_5"] = closes.pct_change(5).fillna(0)
+        index[f"{name}_diff_10"] = closes.pct_change(10).fillna(0)
+    index["sp500_ma_30"] = index["sp500_price"].dropna().rolling(ROLLING_WINDOW, min_periods = 1).mean()
+    index = index[["s_date", "sp500_price"] + MARKET_FEATURES].ffill()
+
+    panel = panel.drop(columns = ["sp500_price"], errors = "ignore")
+    panel["row_id"] = range(len(panel))
+    merged = pd.merge_asof(panel.sort_values("s_date"), index, on = "s_date", direction = "backward")
+    panel = merged.sort_values("row_id").drop(columns = "row_id").reset_index(drop = True)
+    panel[MARKET_FEATURES] = panel[MARKET_FEATURES].fillna(0)
+    return panel
+
+
+def add_relative_features(panel, sector_df = None):
+    """
+    Add relative strength against the S&P 500 and the symbol's sector ETF.
+
+    rs_<benchmark>_10 is the symbol's 10-row return minus the benchmark's
+    10-day return, so it needs add_price_features() and add_market_features()
+    first. sector_df holds (stock_symbol, s_date, sector_price) rows, joined
+    as of each price date per symbol; symbols without a sector get zeros.
+    """
+    panel["rs_sp500_10"] = panel["price_diff_10"] - panel["sp500_diff_10"]
+    if sector_df is None or sector_df.empty:
+        panel["rs_sector_10"] = 0.0
+        return panel
+
+    sector = sector_df[["stock_symbol", "s_date", "sector_price"]].dropna()
+    sector = pd.DataFrame({"stock_symbol": sector["stock_symbol"], "event_date": _as_datetime(sector["s_date"]),
+                           "sector_price": pd.to_numeric(sector["sector_price"])})
+    sector = sector.sort_values(["stock_symbol", "event_date"]).drop_duplicates(["stock_symbol", "event_date"])
+    sector["sector_diff_10"] = sector.groupby("stock_symbol")["sector_price"].pct_change(10).fillna(0)
+
+    keys = pd.DataFrame({"row_id": range(len(panel)), "stock_symbol": panel["stock_symbol"].to_numpy(), "s_date": panel["s_date"].to_numpy()})
+    sector_diff = _asof(keys, sector, "s_date", ["sector_diff_10"])["sector_diff_10"].to_numpy()
+    panel["rs_sector_10"] = np.where(np.isnan(sector_diff), 0.0, panel["price_diff_10"].to_numpy() - sector_diff)
+    return panel
+
+
+def build_features(prices_df, trades_df, sp500_df = None, sector_df = None):
+    """
+    Build the model feature panel for every symbol in a single pass.
+
+    This is the one place features are computed; training and prediction both
+    call it so the two paths always see identical columns. Rows are returned
+    sorted by (stock_symbol, s_date). Each target_<h> column is 1 if the price
+    is higher h rows later, 0 if not, and NaN for the latest rows whose
+    outcome is not known yet.
+
+    sp500_df and sector_df are the frames returned by
+    MarketData.benchmarks(); either may be None.
+    """
+    panel = prices_df[["stock_symbol", "s_date", "s_price"]].copy()
+    panel["s_date"] = _as_datetime(panel["s_date"])
+    panel["s_price"] = pd.to_numeric(panel["s_price"], errors = "coerce")
+    panel = panel.dropna(subset = ["s_date", "s_price"])
+    panel = panel.sort_values(["stock_symbol", "s_date"]).reset_index(drop = True)
+
+    panel = add_market_features(panel, sp500_df)
+    panel = add_price_features(panel)
+    panel = add_relative_features(panel, sector_df)
+    panel = add_trade_features(panel, trades_df)
+
+    prices = panel.groupby("stock_symbol", sort = False)["s_price"]
+    for h in HORIZONS:
+        future_price = prices.shift(-h)
+        panel[f"target_{h}"] = (future_price > panel["s_price"]).astype(float).where(future_price.notna())
+    return panel
+
+
+def latest_features(panel):
+    """Return the most recent feature row for each symbol, indexed by stock_symbol."""
+    return panel.groupby("stock_symbol", sort = False).tail(1).set_index("stock_symbol")
@@ -0,0 +1,163 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 50     # Tickers per provider request
+WORKERS = 4         # Concurrent provider requests
+RATE = 2.0          # Provider requests per second
+RETRIES = 3
+BACKOFF = 1.0       # Seconds before the first retry, doubled after each failure
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` acquisitions per second with bursts up to `capacity`."""
+
+    def __init__(self, rate = RATE, capacity = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens = 1):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchStats:
+    """Outcome of one batched provider request."""
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.rows = 0
+        self.attempts = 0
+        self.latency = 0.0   # Seconds spent in the successful (or last) request
+        self.error = None
+
+    def __str__(self):
+        status = f"error: {self.error}" if self.error else f"{self.rows} rows"
+        return f"{len(self.symbols)} symbols, {self.attempts} attempt(s), {self.latency:.2f}s, {status}"
+
+
+class FetchScheduler:
+    """
+    Fetch many (symbol, start, end) requests through a provider's history_batch().
+
+    Requests are sorted by start date and grouped into batches of up to
+    batch_size symbols, each fetched with one multi-ticker call covering the
+    batch's widest range (results are trimmed back per request). Batches run
+    on a bounded thread pool, every call first takes a token from the rate
+    limiter, and failed calls are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, provider, batch_size = BATCH_SIZE, workers = WORKERS, limiter = None,
+                 retries = RETRIES, backoff = BACKOFF):
+        self.provider = provider
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = limiter or TokenBucket()
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = []
+        self.elapsed = 0.0
+
+    def _batches(self, requests):
+        ordered = sorted(set(requests), key = lambda r: (r[1], r[2], r[0]))
+        return [ordered[i:i + self.batch_size] for i in range(0, len(ordered), self.batch_size)]
+
+    def _run_batch(self, batch):
+        symbols = sorted({symbol for symbol, _, _ in batch})
+        start = min(r[1] for r in batch)
+        end = max(r[2] for r in batch)
+        stats = BatchStats(symbols)
+
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            stats.attempts += 1
+            began = time.perf_counter()
+            try:
+                frames = self.provider.history_batch(symbols, start, end)
+                stats.latency = time.perf_counter() - began
+                stats.error = None
+                break
+            except Exception as e:
+                stats.latency = time.perf_counter() - began
+                stats.error = e
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+        else:
+            return stats, {}
+
+        results = {}
+        for request in batch:
+            symbol, request_start, request_end = request
+            prices = frames.get(symbol)
+            if prices is None:
+                continue
+            results[request] = prices[(prices["s_date"] >= request_start) & (prices["s_date"] < request_end)].reset_index(drop = True)
+            stats.rows += len(results[request])
+        return stats, results
+
+    def fetch(self, requests):
+        """
+        Fetch every (symbol, start, end) request.
+
+        Returns a dict mapping each request to its DataFrame. Requests whose
+        batch failed after all retries are left out.
+        """
+        batches = self._batches(requests)
+        began = time.perf_counter()
+        results = {}
+        with ThreadPoolExecutor(max_workers = self.workers) as executor:
+            for stats, batch_results in executor.map(self._run_batch, batches):
+                self.stats.append(stats)
+                results.update(batch_results)
+        self.elapsed += time.perf_counter() - began
+        return results
+
+    def report(self):
+        """Print per-batch latency and overall throughput."""
+        for i, stats in enumerate(self.stats, 1):
+            print(f"Batch {i}: {stats}")
+        symbols = sum(len(s.symbols) for s in self.stats)
+        rows = sum(s.rows for s in self.stats)
+        failed = sum(1 for s in self.stats if s.error)
+        elapsed = self.elapsed or float("inf")
+        print(f"Fetched {symbols} symbols / {rows} rows in {len(self.stats)} batches "
+              f"({failed} failed) in {self.elapsed:.2f}s: {symbols / elapsed:.1f} symbols/s, {rows / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    # Offline benchmark against a local stub provider with injected latency
+    import pandas as pd
+    from datetime import date, timedelta
+    from price_cache import FixtureProvider
+
+    symbols = [f"SYM{i}:US" for i in range(500)]
+    days = pd.bdate_range(end = date.today(), periods = 250)
+    prices = pd.DataFrame({
+        "stock_symbol": [s for s in symbols for _ in days],
+        "s_date": list(days) * len(symbols),
+        "s_price": 100.0,
+    })
+    start = date.today() - timedelta(days = 180)
+    requests = [(symbol, start, date.today()) for symbol in symbols]
+
+    for batch_size, workers in ((1, 1), (1, 8), (50, 4), (100, 8)):
+        provider = FixtureProvider(prices, latency = 0.05, failure_rate = 0.02)
+        scheduler = FetchScheduler(provider, batch_size = batch_size, workers = workers,
+                                   limiter = TokenBucket(rate = 50), backoff = 0.01)
+        scheduler.fetch(requests)
+        symbols_done = sum(len(s.symbols) for s in scheduler.stats if not s.error)
+        print(f"batch_size={batch_size:<4} workers={workers:<2} {len(scheduler.stats):>4} requests, "
+              f"{scheduler.elapsed:6.2f}s, {symbols_done / scheduler.elapsed:8.1f} symbols/s")
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from features import FEATURE_COLUMNS, HORIZONS
+
+LOOKBACK = 60      # Recent rows used for each symbol's return statistics
+BAND_Z = 1.2816    # z-score of the 80% price band
+
+
+def up_probabilities(model, X):
+    """
+    Return P(price up) for each row and horizon as an array of shape (len(X), horizons).
+
+    Handles horizons where the forest only ever saw one class during training.
+    """
+    probabilities = model.predict_proba(X)
+    if getattr(model, "n_outputs_", 1) == 1:
+        probabilities, classes = [probabilities], [model.classes_]
+    else:
+        classes = model.classes_
+
+    up = np.zeros((len(X), len(probabilities)))
+    for k, (proba, labels) in enumerate(zip(probabilities, classes)):
+        labels = list(labels)
+        if 1 in labels:
+            up[:, k] = proba[:, labels.index(1)]
+    return up
+
+
+def horizon_return_stats(panel, lookback = LOOKBACK):
+    """
+    Per-symbol size and spread of h-row returns over the last lookback rows.
+
+    Returns two DataFrames indexed by stock_symbol with one column per
+    horizon: the mean absolute return (expected size of a move) and the
+    standard deviation of returns (width of the price band).
+    """
+    prices = panel.groupby("stock_symbol", sort = False)["s_price"]
+    recent = panel.groupby("stock_symbol", sort = False).cumcount(ascending = False) < lookback + max(HORIZONS)
+    symbol = panel["stock_symbol"][recent]
+
+    move, spread = {}, {}
+    for h in HORIZONS:
+        returns = prices.pct_change(h)[recent]
+        move[h] = returns.abs().groupby(symbol).mean()
+        spread[h] = returns.groupby(symbol).std()
+    return pd.DataFrame(move).fillna(0), pd.DataFrame(spread).fillna(0)
+
+
+def forecast(models, latest, move, spread):
+    """
+    Forecast every horizon for every symbol in one vectorized batch.
+
+    models maps symbol -> fitted multi-horizon model and latest is the
+    latest_features() frame. Each model is called once for all horizons; the
+    expected price at horizon h is the latest price moved by (2p - 1) times
+    the symbol's typical h-row move, and the band adds +/- BAND_Z standard
+    deviations of its h-row returns. Dates are h business days after each
+    symbol's last price.
+
+    Returns one row per (symbol, horizon) with stock_symbol, s_date, horizon,
+    prob_up, s_price, price_low and price_high.
+    """
+    symbols = list(models)
+    horizons = np.array(list(HORIZONS))
+    X = latest.loc[symbols, FEATURE_COLUMNS].to_numpy(dtype = float)
+    prob_up = np.vstack([up_probabilities(models[symbol], X[i:i + 1]) for i, symbol in enumerate(symbols)])
+
+    last_price = latest.loc[symbols, "s_price"].to_numpy(dtype = float)[:, None]
+    expected = (2 * prob_up - 1) * move.reindex(symbols).fillna(0).to_numpy()
+    width = BAND_Z * spread.reindex(symbols).fillna(0).to_numpy()
+
+    last_date = latest.loc[symbols, "s_date"].to_numpy()
+    dates = [pd.DatetimeIndex(last_date) + pd.offsets.BDay(h) for h in horizons]
+
+    return pd.DataFrame({
+        "stock_symbol": np.repeat(symbols, len(horizons)),
+        "s_date": np.column_stack([d.date for d in dates]).ravel(),
+        "horizon": np.tile(horizons, len(symbols)),
+        "prob_up": prob_up.ravel(),
+        "s_price": (last_price * (1 + expected)).ravel(),
+        "price_low": (last_price * (1 + expected - width)).ravel(),
+        "price_high": (last_price * (1 + expected + width)).ravel(),
+    })
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+from datetime import date, timedelta
+import pandas as pd
+from price_cache import PriceCache, _to_date
+
+# Reference series joined onto every symbol, by column prefix
+INDEXES = {"sp500": "^GSPC", "nasdaq": "^IXIC"}
+
+# SPDR sector ETF for each yfinance sector name
+SECTOR_ETFS = {
+    "Basic Materials": "XLB",
+    "Communication Services": "XLC",
+    "Consumer Cyclical": "XLY",
+    "Consumer Defensive": "XLP",
+    "Energy": "XLE",
+    "Financial Services": "XLF",
+    "Healthcare": "XLV",
+    "Industrials": "XLI",
+    "Real Estate": "XLRE",
+    "Technology": "XLK",
+    "Utilities": "XLU",
+}
+
+MEMORY_TTL = 15 * 60   # Seconds a series stays memoized in-process
+SECTOR_TTL = 30        # Days before a symbol's sector is looked up again
+
+_market = None
+
+
+def market_data():
+    """Shared MarketData for this process (yfinance-backed)."""
+    global _market
+    if _market is None:
+        _market = MarketData()
+    return _market
+
+
+class MarketData:
+    """
+    Benchmark price series with an in-process and an on-disk tier.
+
+    Series are read through a PriceCache, so each one is downloaded once and
+    later only extended by the dates it is missing. On top of that, every
+    series is memoized in-process for ttl seconds: repeated requests inside a
+    run (training, then prediction) are served from memory, and requests that
+    reach past the memoized range widen it with one cache call. All series a
+    call needs are requested together, so the fetch scheduler downloads the
+    indexes and sector ETFs in a single batch.
+
+    Symbol sectors come from the provider and are kept in sectors.json next
+    to the price cache for SECTOR_TTL days.
+    """
+
+    def __init__(self, cache = None, ttl = MEMORY_TTL, sector_ttl = SECTOR_TTL):
+        self.cache = cache or PriceCache()
+        self.ttl = ttl
+        self.sector_ttl = sector_ttl
+        self.sector_path = os.path.join(self.cache.path, "sectors.json")
+        self.memo = {}      # ticker -> (loaded_at, start, end, prices)
+        self.sectors = None
+        self.hits = 0
+        self.misses = 0
+
+    def series(self, tickers, start, end):
+        """Return {ticker: prices} for start <= s_date < end."""
+        start, end = _to_date(start), _to_date(end)
+        now = time.monotonic()
+        for ticker in [t for t, entry in self.memo.items() if now - entry[0] > self.ttl]:
+            del self.memo[ticker]
+
+        requests = []
+        for ticker in sorted(set(tickers)):
+            entry = self.memo.get(ticker)
+            if entry and entry[1] <= start and end <= entry[2]:
+                self.hits += 1
+            else:
+                self.misses += 1
+                requests.append((ticker, min(start, entry[1]), max(end, entry[2])) if entry else (ticker, start, end))
+
+        if requests:
+            fetched = self.cache.get_many(requests)
+            for ticker, request_start, request_end in requests:
+                self.memo[ticker] = (now, request_start, request_end, fetched[ticker])
+
+        results = {}
+        for ticker in set(tickers):
+            prices = self.memo[ticker][3]
+            results[ticker] = prices[(prices["s_date"] >= start) & (prices["s_date"] < end)].reset_index(drop = True)
+        return results
+
+    def _load_sectors(self):
+        try:
+            with open(self.sector_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def sector_etfs(self, symbols):
+        """Return {symbol: sector ETF ticker or None}, looking up only unknown or stale symbols."""
+        if self.sectors is None:
+            self.sectors = self._load_sectors()
+
+        stale = (date.today() - timedelta(days = self.sector_ttl)).isoformat()
+        lookups = [s for s in set(symbols) if s not in self.sectors or self.sectors[s][1] < stale]
+        for symbol in sorted(lookups):
+            self.cache.scheduler.limiter.acquire()
+            self.sectors[symbol] = [self.cache.provider.sector(symbol), date.today().isoformat()]
+
+        if lookups:
+            os.makedirs(self.cache.path, exist_ok = True)
+            with open(self.sector_path + ".tmp", "w") as f:
+                json.dump(self.sectors, f)
+            os.replace(self.sector_path + ".tmp", self.sector_path)
+        return {symbol: SECTOR_ETFS.get(self.sectors[symbol][0]) for symbol in symbols}
+
+    def benchmarks(self, symbols, start, end):
+        """
+        Return (index_df, sector_df) for the given symbols and date range.
+
+        index_df has s_date plus one <name>_price column per entry in
+        INDEXES. sector_df has one row per (stock_symbol, s_date) with the
+        close of the symbol's sector ETF as sector_price; symbols without a
+        known sector are left out. Either frame is empty if nothing could be
+        fetched.
+        """
+        etfs = self.sector_etfs(list(symbols)) if len(symbols) else {}
+        prices = self.series(list(INDEXES.values()) + [e for e in etfs.values() if e], start, end)
+
+        index_df = None
+        for name, ticker in INDEXES.items():
+            series = prices[ticker].rename(columns = {"s_price": f"{name}_price"})
+            index_df = series if index_df is None else index_df.merge(series, on = "s_date", how = "outer")
+        if not index_df.empty:
+            index_df["s_date"] = pd.to_datetime(index_df["s_date"])
+            index_df = index_df.sort_values("s_date").reset_index(drop = True)
+
+        frames = [prices[etf].assign(stock_symbol = symbol) for symbol, etf in etfs.items() if etf and not prices[etf].empty]
+        if frames:
+            sector_df = pd.concat(frames, ignore_index = True).rename(columns = {"s_price": "sector_price"})
+            sector_df["s_date"] = pd.to_datetime(sector_df["s_date"])
+            sector_df = sector_df[["stock_symbol", "s_date", "sector_price"]]
+        else:
+            sector_df = pd.DataFrame(columns = ["stock_symbol", "s_date", "sector_price"])
+        return index_df, sector_df
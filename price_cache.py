@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import random
+import shutil
+import threading
+from datetime import date, datetime
+from time import sleep
+import pandas as pd
+import yfinance as yf
+from fetch_scheduler import FetchScheduler
+
+CACHE_DIR = "price_cache"
+MAX_AGE = 90   # Days a symbol's cache may go unused before evict() removes it
+PRICE_COLUMNS = ["s_date", "s_price"]
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class PriceProvider:
+    """
+    Source of daily closing prices.
+
+    history() returns a DataFrame with s_date (datetime.date) and s_price
+    columns for start <= s_date < end, empty if there is no data.
+    """
+
+    def history(self, symbol, start, end):
+        raise NotImplementedError
+
+    def history_batch(self, symbols, start, end):
+        """Return {symbol: DataFrame} for several symbols; providers with a multi-ticker API override this."""
+        return {symbol: self.history(symbol, start, end) for symbol in symbols}
+
+    def sector(self, symbol):
+        """Return the symbol's sector name, or None if unknown."""
+        return None
+
+
+def _closes(frame):
+    """Convert a yfinance frame with a Close column into (s_date, s_price) rows."""
+    closes = frame["Close"].dropna()
+    return pd.DataFrame({"s_date": closes.index.date, "s_price": closes.to_numpy(dtype = float)})
+
+
+class YFinanceProvider(PriceProvider):
+    """Daily closes from yfinance. Request pacing is left to the FetchScheduler."""
+
+    def history(self, symbol, start, end):
+        # Strip any suffix
+        hist = yf.Ticker(symbol.split(":")[0]).history(start = start, end = end)
+        if hist.empty:
+            return pd.DataFrame(columns = PRICE_COLUMNS)
+        return _closes(hist)
+
+    def history_batch(self, symbols, start, end):
+        """Download several tickers with a single yf.download call."""
+        tickers = {symbol: symbol.split(":")[0] for symbol in symbols}
+        data = yf.download(sorted(set(tickers.values())), start = start, end = end, group_by = "ticker",
+                           auto_adjust = True, progress = False, threads = False)
+
+        frames = {}
+        for symbol, ticker in tickers.items():
+            if data.empty:
+                frames[symbol] = pd.DataFrame(columns = PRICE_COLUMNS)
+            elif isinstance(data.columns, pd.MultiIndex):
+                frames[symbol] = _closes(data[ticker]) if ticker in data.columns.get_level_values(0) else pd.DataFrame(columns = PRICE_COLUMNS)
+            else:
+                frames[symbol] = _closes(data)
+        return frames
+
+    def sector(self, symbol):
+        try:
+            return yf.Ticker(symbol.split(":")[0]).info.get("sector")
+        except Exception as e:
+            print(f"Error looking up sector for {symbol}: {e}")
+            return None
+
+
+class FixtureProvider(PriceProvider):
+    """
+    Serve prices from a local DataFrame (stock_symbol, s_date, s_price).
+
+    Stands in for yfinance in tests and benchmarks; requests records every
+    (symbol, start, end) it was asked for. latency (seconds per call) and
+    failure_rate (chance a call raises ConnectionError) simulate a remote
+    provider; a batch call costs the same latency as a single one. sectors
+    maps symbol -> sector name for sector().
+    """
+
+    def __init__(self, prices_df, latency = 0.0, failure_rate = 0.0, seed = 0, sectors = None):
+        prices = prices_df.copy()
+        prices["s_date"] = pd.to_datetime(prices["s_date"]).dt.date
+        self.prices = {symbol: group[PRICE_COLUMNS].sort_values("s_date").reset_index(drop = True)
+                       for symbol, group in prices.groupby("stock_symbol")}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sectors = sectors or {}
+        self.random = random.Random(seed)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def _call(self):
+        sleep(self.latency)
+        with self.lock:
+            failed = self.random.random() < self.failure_rate
+        if failed:
+            raise ConnectionError("simulated provider failure")
+
+    def history(self, symbol, start, end):
+        self._call()
+        return self._history(symbol, start, end)
+
+    def history_batch(self, symbols, start, end):
+        self._call()
+        return {symbol: self._history(symbol, start, end) for symbol in symbols}
+
+    def _history(self, symbol, start, end):
+        with self.lock:
+            self.requests.append((symbol, start, end))
+        prices = self.prices.get(symbol)
+        if prices is None:
+            return pd.DataFrame(columns = PRICE_COLUMNS)
+        return prices[(prices["s_date"] >= start) & (prices["s_date"] < end)].reset_index(drop = True)
+
+    def sector(self, symbol):
+        return self.sectors.get(symbol)
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) date ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def missing_ranges(covered, start, end):
+    """Return the parts of [start, end) not inside any covered range."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in merge_ranges(covered):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class PriceCache:
+    """
+    On-disk Parquet price cache, partitioned by symbol.
+
+    Each symbol has <path>/stock_symbol=<symbol>/prices.parquet and a
+    coverage.json listing the [start, end) date ranges already requested from
+    the provider. Only the gaps in that coverage are fetched, through a
+    FetchScheduler (batched, rate limited, retried). Today is never marked as
+    covered, since its close may not be final yet, and ranges whose fetch
+    failed stay uncovered so the next run retries them. Reading a symbol
+    touches its coverage.json, so evict() can drop symbols nobody has asked
+    for in max_age days.
+    """
+
+    def __init__(self, path = CACHE_DIR, provider = None, scheduler = None):
+        self.path = path
+        self.provider = provider or YFinanceProvider()
+        self.scheduler = scheduler or FetchScheduler(self.provider)
+        self.fetched = 0   # Provider requests (gaps) made by this cache
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.path, "stock_symbol=" + symbol.replace(":", "_").replace("/", "_"))
+
+    def _load(self, symbol):
+        symbol_dir = self._symbol_dir(symbol)
+        try:
+            with open(os.path.join(symbol_dir, "coverage.json")) as f:
+                coverage = [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in json.load(f)]
+            prices = pd.read_parquet(os.path.join(symbol_dir, "prices.parquet"))
+            prices["s_date"] = pd.to_datetime(prices["s_date"]).dt.date
+            os.utime(os.path.join(symbol_dir, "coverage.json"))
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring unreadable price cache for {symbol}: {e}")
+            return [], pd.DataFrame(columns = PRICE_COLUMNS)
+        return coverage, prices
+
+    def _store(self, symbol, coverage, prices):
+        symbol_dir = self._symbol_dir(symbol)
+        os.makedirs(symbol_dir, exist_ok = True)
+
+        prices_path = os.path.join(symbol_dir, "prices.parquet")
+        prices.to_parquet(prices_path + ".tmp", index = False)
+        os.replace(prices_path + ".tmp", prices_path)
+
+        coverage_path = os.path.join(symbol_dir, "coverage.json")
+        with open(coverage_path + ".tmp", "w") as f:
+            json.dump([[s.isoformat(), e.isoformat()] for s, e in coverage], f)
+        os.replace(coverage_path + ".tmp", coverage_path)
+
+    def get(self, symbol, start, end):
+        """Return prices for start <= s_date < end, fetching only what is not cached."""
+        return self.get_many([(symbol, start, end)])[symbol]
+
+    def get_many(self, requests):
+        """
+        Return {symbol: prices} for many (symbol, start, end) requests.
+
+        The gaps of every symbol are fetched together, so the scheduler can
+        batch them into multi-ticker provider calls.
+        """
+        requests = [(symbol, _to_date(start), _to_date(end)) for symbol, start, end in requests]
+        state = {}
+        gap_requests = []
+        for symbol, start, end in requests:
+            if symbol not in state:
+                state[symbol] = self._load(symbol)
+            gap_requests.extend((symbol, gap_start, gap_end) for gap_start, gap_end in missing_ranges(state[symbol][0], start, end))
+
+        fetched = self.scheduler.fetch(gap_requests) if gap_requests else {}
+        self.fetched += len(gap_requests)
+
+        done_by_symbol = {}
+        for request in gap_requests:
+            if request in fetched:
+                done_by_symbol.setdefault(request[0], []).append(request[1:])
+
+        today = date.today()
+        for symbol, done in done_by_symbol.items():
+            coverage, prices = state[symbol]
+            frames = [prices] if not prices.empty else []
+            frames += [fetched[(symbol, s, e)][PRICE_COLUMNS] for s, e in done if not fetched[(symbol, s, e)].empty]
+            if frames:
+                prices = pd.concat(frames, ignore_index = True)
+                prices = prices.drop_duplicates("s_date", keep = "last").sort_values("s_date").reset_index(drop = True)
+            coverage = merge_ranges(coverage + [(s, min(e, today)) for s, e in done if s < min(e, today)])
+            state[symbol] = (coverage, prices)
+            self._store(symbol, coverage, prices[PRICE_COLUMNS])
+
+        results = {}
+        for symbol, start, end in requests:
+            prices = state[symbol][1]
+            results[symbol] = prices[(prices["s_date"] >= start) & (prices["s_date"] < end)].reset_index(drop = True)
+        return results
+
+    def evict(self, max_age = MAX_AGE):
+        """Remove symbols whose cache has not been read or written in max_age days."""
+        cutoff = time.time() - max_age * 86400
+        removed = 0
+        for name in os.listdir(self.path) if os.path.isdir(self.path) else []:
+            coverage_path = os.path.join(self.path, name, "coverage.json")
+            if name.startswith("stock_symbol=") and os.path.isfile(coverage_path) and os.path.getmtime(coverage_path) < cutoff:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors = True)
+                removed += 1
+        return removed
@@ -0,0 +1,133 @@
+import os
+import json
+import pickle
+import hashlib
+from datetime import datetime
+
+MODEL_DIR = "models"
+KEEP_VERSIONS = 3                   # Versions kept per symbol
+MAX_BYTES = 512 * 1024 * 1024       # Total registry size before LRU eviction
+
+
+def input_hash(arrays, params):
+    """Hash a symbol's input arrays and the hyperparameters that produced its model."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys = True, default = str).encode())
+    for array in arrays:
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:32]
+
+
+class ModelRegistry:
+    """
+    On-disk store of fitted models, keyed by symbol and input hash.
+
+    Each entry is a pickle at <path>/<symbol>/<hash>.pkl holding the model,
+    its feature schema, metrics, hyperparameters and training state (rows
+    seen so far, used by incremental updates). Loading an entry touches
+    its mtime, so eviction drops least recently used versions first: at most
+    keep_versions per symbol and max_bytes in total.
+    """
+
+    def __init__(self, path = MODEL_DIR, keep_versions = KEEP_VERSIONS, max_bytes = MAX_BYTES):
+        self.path = path
+        self.keep_versions = keep_versions
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.path, symbol.replace(":", "_").replace("/", "_"))
+
+    def _entry_path(self, symbol, digest):
+        return os.path.join(self._symbol_dir(symbol), f"{digest}.pkl")
+
+    def load(self, symbol, digest):
+        """Return the stored entry dict for (symbol, digest), or None if there is none."""
+        entry_path = self._entry_path(symbol, digest)
+        try:
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring unreadable model {entry_path}: {e}")
+            self.misses += 1
+            return None
+
+        os.utime(entry_path)
+        self.hits += 1
+        return entry
+
+    def latest(self, symbol):
+        """Return the most recently used entry for symbol, or None."""
+        symbol_dir = self._symbol_dir(symbol)
+        if not os.path.isdir(symbol_dir):
+            return None
+        entries = sorted(self._entries(symbol_dir), reverse = True)
+        if not entries:
+            return None
+        digest = os.path.basename(entries[0][2])[:-len(".pkl")]
+        return self.load(symbol, digest)
+
+    def save(self, symbol, digest, model, feature_schema, metrics, params, state = None):
+        """Store a fitted model and evict old versions of the symbol."""
+        symbol_dir = self._symbol_dir(symbol)
+        os.makedirs(symbol_dir, exist_ok = True)
+        entry = {
+            "symbol": symbol,
+            "hash": digest,
+            "model": model,
+            "feature_schema": list(feature_schema),
+            "metrics": metrics,
+            "params": params,
+            "state": state or {},
+            "created": datetime.now().isoformat(),
+        }
+
+        # Write to a temp file first so a crash never leaves a half-written model
+        entry_path = self._entry_path(symbol, digest)
+        tmp_path = entry_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+
+        self._evict_symbol(symbol_dir)
+
+    def _entries(self, directory):
+        """List (mtime, size, path) for the model files in directory."""
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".pkl"):
+                file_path = os.path.join(directory, name)
+                stat = os.stat(file_path)
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+        return entries
+
+    def _evict_symbol(self, symbol_dir):
+        """Keep only the keep_versions most recently used versions of one symbol."""
+        entries = sorted(self._entries(symbol_dir), reverse = True)
+        for _, _, file_path in entries[self.keep_versions:]:
+            os.remove(file_path)
+
+    def evict(self):
+        """Drop least recently used models until the registry fits in max_bytes."""
+        if not os.path.isdir(self.path):
+            return 0
+
+        entries = []
+        for name in os.listdir(self.path):
+            symbol_dir = os.path.join(self.path, name)
+            if os.path.isdir(symbol_dir):
+                entries.extend(self._entries(symbol_dir))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, file_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(file_path)
+            total -= size
+            removed += 1
+        return removed
@@ -1,11 +1,17 @@
 import psycopg2
-from bs4 import BeautifulSoup
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from psycopg2.extras import execute_values
+import aiohttp
+import asyncio
+from urllib.parse import urlsplit
 import re
+import io
+import csv
 from datetime import date, datetime 
 import time
 from keys import HOST, DATABASE, USER, PASSWORD 
+from trade_parser import parse_rows
+
+DATE_PARTS_RE = re.compile(r'([\d,]+)')
 
 class StockPurchase:
     def __init__(self):
@@ -33,7 +39,7 @@ class StockPurchase:
         """Convert string date to Python date object."""
         try:
             # Handle 'YYYY,MM,DD' format
-            matches = re.findall(r'([\d,]+)', self.purchase_date.replace(",",""))
+            matches = DATE_PARTS_RE.findall(self.purchase_date.replace(",",""))
             if len(matches) >= 3:
                 year, month, day = map(int, matches[:3])
                 return date(year, month, day)
@@ -44,139 +50,342 @@ class StockPurchase:
             print(f"Date parse error for '{self.purchase_date}': {e}")
             return None
     
-def scrape_page(page):
-    """Scrape congressional stock bought trades from Capitol Trades API."""
+TRADES_URL = "https://www.capitoltrades.com/trades?txType=buy&assetType=stock&sortBy=-txDate&page={page}"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}  # Mimic a browser to avoid being blocked
+RETRIES = 3
+TIMEOUT = 30      # Seconds per request
+KEEPALIVE = 30    # Seconds an idle pooled connection is kept open
+QUEUE_SIZE = 1000     # Parsed trades buffered between the scraper and the writer
+WRITE_BATCH = 200     # Trades per INSERT
+FLUSH_INTERVAL = 1.0  # Seconds a partial batch may wait before it is written
 
-    # URL to scrape
-    url = f"https://www.capitoltrades.com/trades?txType=buy&assetType=stock&sortBy=-txDate&page={page}"
 
-    # Send a GET request to the webpage
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }  # Mimic a browser to avoid being blocked
-    trans_list = []
+def trade_key(trade):
+    """Key used to match a scraped trade against stock_purchases, or None if its date is invalid."""
+    db_date = trade.transform_date()
+    if db_date is None:
+        return None
+    return (db_date.isoformat(), trade.symbol, trade.name.strip())
 
-    for attempt in range(3):
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            # Check if the request was successful
 
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, "html.parser")
-            trade_table = soup.find("table")  # Target specific table class
+def valid_trade_key(trade):
+    """trade_key() for a storable trade, None for rows missing a symbol, politician, price or date."""
+    if trade.symbol == "N/A" or trade.name == "N/A" or trade.price is None:
+        return None
+    return trade_key(trade)
 
-            if not trade_table:
-                print(f"Page {page}: No trade table found.")
-                return trans_list
-            
-            rows = trade_table.find_all("tr")[1:]  # Skip header row
-            for row in rows:
-                cols = row.find_all("td")
-                if len(cols) >= 9:  # Adjust based on columns
-                    politician= re.findall(r"[A-Z][^A-Z]*\s[A-Z][^A-Z]*",cols[0].text.strip())
-                    politician = politician[0] if politician else "N/A"
-
-                    stock = re.findall(r"[A-Z]{1,4}:[A-Z]{2}", cols[1].text.strip())
-                    stock = stock[0] if stock else "N/A"
-                    if stock == 'OOGL:US':
-                        stock = "GOOGL:US"
-                    elif stock == 'CACN:US':
-                        stock = "ACN:US"
-                    elif stock == 'PCEG:US':
-                        stock = 'CEG:US'
-                    # Obtain and format the date and price
-                    date_full = cols[3].text.strip().replace(" ", ",")  
-                    date_full = date_full[:-4] + ',' + date_full[-4:]
-                    price = cols[8].text.strip().replace("$", '').replace(",", '')
-                    price = float(price) if price and price != "N/A" else None
-
-                    purchase = StockPurchase()
-                    purchase.set_date(date_full)
-                    purchase.set_symbol(stock)
-                    purchase.set_price(price)
-                    purchase.set_name(politician)
-                    trans_list.append(purchase)
-            print(f"Page {page}: Scraped {len(trans_list)} trades.")
-            return trans_list
-        except requests.RequestException as e:
-            print(f"Page {page}: Attempt {attempt + 1} failed - {e}")
-            time.sleep(2 ** attempt)
 
+async def _has_new_trades(trades, known):
+    """True if any valid trade is not stored yet; known is a set of keys or a callable returning the stored subset."""
+    keys = {key for key in map(valid_trade_key, trades) if key is not None}
+    if not keys:
+        return False
+    stored = await asyncio.to_thread(known, keys) if callable(known) else keys & known
+    return len(stored) < len(keys)
+
+
+def parse_trades(html, page, parser = None):
+    """Parse the bought trades out of one Capitol Trades listing page (parser: see trade_parser.PARSERS)."""
+    trans_list = []
+    rows = parse_rows(html, parser)
+
+    if rows is None:
+        print(f"Page {page}: No trade table found.")
+        return trans_list
+
+    for date_full, price, stock, politician in rows:
+        purchase = StockPurchase()
+        purchase.set_date(date_full)
+        purchase.set_symbol(stock)
+        purchase.set_price(price)
+        purchase.set_name(politician)
+        trans_list.append(purchase)
+    print(f"Page {page}: Scraped {len(trans_list)} trades.")
     return trans_list
 
 
-def scrape_trades(max_pages = 40, workers = 5):
-    """Scrape congressional trades using multithreading."""
+class AdaptiveBackoff:
+    """
+    Delay before each request to one host, adapted to how the host responds.
+
+    Throttling (429/503) and errors multiply the delay (honouring Retry-After
+    when the server sends one); every success shrinks it again, so a healthy
+    host is paged at full speed and a struggling one is backed off from.
+    """
+
+    def __init__(self, initial = 0.5, max_delay = 60.0, factor = 2.0, decay = 0.5):
+        self.initial = initial
+        self.max_delay = max_delay
+        self.factor = factor
+        self.decay = decay
+        self.delay = 0.0
+
+    async def wait(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    def success(self):
+        self.delay = self.delay * self.decay if self.delay * self.decay >= 0.05 else 0.0
+
+    def failure(self, retry_after = None):
+        self.delay = min(self.max_delay, max(retry_after or 0.0, self.delay * self.factor or self.initial))
+
 
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+async def fetch_page(session, url, page, backoff, retries = RETRIES):
+    """Fetch one listing page through the shared session; returns its HTML or None after all retries fail."""
+    for attempt in range(retries):
+        await backoff.wait()
+        try:
+            async with session.get(url) as response:
+                if response.status in (429, 503):
+                    backoff.failure(_retry_after(response))
+                    print(f"Page {page}: Attempt {attempt + 1} throttled ({response.status}), backing off {backoff.delay:.1f}s")
+                    continue
+                response.raise_for_status()
+                html = await response.text()
+                backoff.success()
+                return html
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            backoff.failure()
+            print(f"Page {page}: Attempt {attempt + 1} failed - {e!r}")
+    return None
+
+
+async def scrape_trades_async(max_pages = 40, concurrency = 5, known = None, url = TRADES_URL, parser = None, sink = None):
+    """
+    Scrape listing pages 1..max_pages over one pooled keep-alive session.
+
+    Pages are fetched in waves of up to concurrency requests (also the
+    per-host connection limit). The listing is sorted newest first, so with
+    known (a set of trade_key() tuples already in stock_purchases, or a
+    callable that returns which of the given keys are stored) the scrape is
+    incremental: waves start at one page and double while pages keep
+    turning up new trades, and paging stops at the first page whose trades
+    are all known. Without known, every page up to max_pages is fetched. A
+    page with no trades always ends the listing.
+
+    parser picks the HTML backend (trade_parser.PARSERS). With sink (an async
+    callable), each page's trades are awaited into it as soon as the page is
+    parsed instead of being collected.
+
+    Returns (trades, pages_requested); trades is empty when sink is given.
+    """
     trans_list = []
-    start_time = time.time()
+    backoffs = {}
+    connector = aiohttp.TCPConnector(limit_per_host = concurrency, keepalive_timeout = KEEPALIVE)
+    timeout = aiohttp.ClientTimeout(total = TIMEOUT)
+
+    async with aiohttp.ClientSession(headers = HEADERS, connector = connector, timeout = timeout) as session:
+        page, wave, requested = 1, 1 if known is not None else concurrency, 0
+        while page <= max_pages:
+            pages = range(page, min(page + wave, max_pages + 1))
+            urls = [url.format(page = p) for p in pages]
+            htmls = await asyncio.gather(*(
+                fetch_page(session, u, p, backoffs.setdefault(urlsplit(u).netloc, AdaptiveBackoff()))
+                for u, p in zip(urls, pages)))
+            requested += len(pages)
+
+            done = False
+            for p, html in zip(pages, htmls):
+                if html is None:
+                    print(f"Page {p}: Giving up after {RETRIES} attempts.")
+                    continue
+                trades = parse_trades(html, p, parser)
+                if sink is not None:
+                    await sink(trades)
+                else:
+                    trans_list.extend(trades)
+                if not trades:
+                    done = True
+                elif known is not None and not await _has_new_trades(trades, known):
+                    print(f"Page {p}: No new trades, stopping.")
+                    done = True
+                if done:
+                    break
+            if done:
+                break
+            page += len(pages)
+            wave = min(concurrency, wave * 2)
 
-    with ThreadPoolExecutor(max_workers = workers) as executor:
-        future_to_page = {executor.submit(scrape_page, page): page for page in range(1, max_pages + 1)}
-        for future in as_completed(future_to_page):
-            page = future_to_page[future]
-            try:
-                trades = future.result()
-                trans_list.extend(trades)
-            except Exception as e:
-                print(f"Page {page}: Error - {e}")
-
-    print(f"Scraped {len(trans_list)} trades in {time.time() - start_time:.2f} seconds.")
+    return trans_list, requested
+
+
+def scrape_trades(max_pages = 40, concurrency = 5, known = None, url = TRADES_URL, parser = None):
+    """Scrape congressional trades with the asyncio engine (see scrape_trades_async)."""
+    start_time = time.time()
+    trans_list, requested = asyncio.run(scrape_trades_async(max_pages, concurrency, known, url, parser))
+    print(f"Scraped {len(trans_list)} trades from {requested} pages in {time.time() - start_time:.2f} seconds.")
     return trans_list
 
 
+class TradeWriter:
+    """
+    Load scraped trades into stock_purchases in micro-batches, deduplicated by the database.
+
+    Invalid trades are dropped before they reach the database. Each batch is
+    COPYed into a temporary staging table and moved over with INSERT ... ON
+    CONFLICT DO NOTHING against the (purchase_date, stock_symbol, name)
+    unique index, so the cost of a batch does not depend on how many trades
+    are already stored. Only summary counters are kept.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cur = conn.cursor()
+        self.cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS stock_purchases_stage (
+                purchase_date DATE, purchase_price NUMERIC(10,2), stock_symbol VARCHAR(15), name VARCHAR(100)
+            ) ON COMMIT DELETE ROWS
+        """)
+        self.conn.commit()
+        self.received = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.batches = 0
+
+    def write(self, trades):
+        self.received += len(trades)
+        buffer = io.StringIO()
+        out = csv.writer(buffer)
+        for t in trades:
+            key = valid_trade_key(t)
+            if key is None:
+                self.invalid += 1
+            else:
+                out.writerow((key[0], t.price, t.symbol, key[2]))
+        if not buffer.tell():
+            return
+
+        buffer.seek(0)
+        self.cur.copy_expert("COPY stock_purchases_stage (purchase_date, purchase_price, stock_symbol, name) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.cur.execute("""
+            INSERT INTO stock_purchases (purchase_date, purchase_price, stock_symbol, name)
+            SELECT DISTINCT ON (purchase_date, stock_symbol, name) purchase_date, purchase_price, stock_symbol, name
+            FROM stock_purchases_stage
+            ON CONFLICT (purchase_date, stock_symbol, name) DO NOTHING
+        """)
+        self.inserted += self.cur.rowcount
+        self.conn.commit()
+        self.batches += 1
+
+    def stored_keys(self, keys):
+        """Return the subset of trade_key() tuples already in stock_purchases (one indexed lookup)."""
+        with self.conn.cursor() as cur:
+            rows = execute_values(cur, """
+                SELECT p.purchase_date, p.stock_symbol, p.name
+                FROM stock_purchases p
+                JOIN (VALUES %s) AS k (purchase_date, stock_symbol, name)
+                  ON p.purchase_date = k.purchase_date::date AND p.stock_symbol = k.stock_symbol AND p.name = k.name
+            """, list(keys), fetch = True)
+        return {(row[0].isoformat(), row[1], row[2]) for row in rows}
+
+    def close(self):
+        self.cur.close()
+
+    def summary(self):
+        duplicates = self.received - self.invalid - self.inserted
+        return (f"{self.inserted} new trades in {self.batches} batches, "
+                f"{duplicates} already stored, {self.invalid} invalid")
+
+
+async def _write_stream(queue, writer, batch_size, flush_interval, failure):
+    """Consume trades from queue and write them in batches until the None sentinel arrives."""
+    batch, done = [], False
+    while not done:
+        try:
+            trade = await asyncio.wait_for(queue.get(), flush_interval)
+            if trade is None:
+                done = flush = True
+            else:
+                batch.append(trade)
+                flush = len(batch) >= batch_size
+        except asyncio.TimeoutError:
+            flush = True   # Nothing arrived for a while: write what is waiting
+
+        if flush and batch:
+            # After a failure keep draining so the scraper never blocks on a full queue
+            if not failure:
+                try:
+                    # psycopg2 blocks, so the write runs in a thread while scraping continues
+                    await asyncio.to_thread(writer.write, batch)
+                except psycopg2.Error as e:
+                    failure.append(e)
+            batch = []
+
+
+async def stream_trades_async(conn, max_pages = 40, concurrency = 5, incremental = True, url = TRADES_URL,
+                              parser = None, queue_size = QUEUE_SIZE, batch_size = WRITE_BATCH,
+                              flush_interval = FLUSH_INTERVAL):
+    """
+    Scrape and load trades as one streaming pipeline.
+
+    The scraper pushes each parsed trade into a queue bounded at queue_size;
+    when the writer falls behind, the scraper waits (backpressure), so
+    memory stays flat however many pages are fetched. The writer flushes
+    batch_size trades at a time, or whatever has arrived after
+    flush_interval seconds, and the rest in a final flush when scraping
+    ends. A database error stops the scrape. Returns the TradeWriter.
+    """
+    writer = await asyncio.to_thread(TradeWriter, conn)
+    queue = asyncio.Queue(maxsize = queue_size)
+    failure = []
+    consumer = asyncio.create_task(_write_stream(queue, writer, batch_size, flush_interval, failure))
+
+    async def sink(trades):
+        for trade in trades:
+            if failure:
+                raise failure[0]
+            await queue.put(trade)
+
+    try:
+        _, requested = await scrape_trades_async(max_pages, concurrency, writer.stored_keys if incremental else None,
+                                                 url, parser, sink)
+    finally:
+        await queue.put(None)
+        await consumer
+    if failure:
+        raise failure[0]
+    await asyncio.to_thread(writer.close)
+    print(f"Scraped {requested} pages: {writer.summary()}.")
+    return writer
+
+
+def stream_trades(max_pages = 40, concurrency = 5, incremental = True, **kwargs):
+    """Run the streaming scrape-to-database pipeline (see stream_trades_async)."""
+    start_time = time.time()
+    try:
+        conn = psycopg2.connect(host=HOST, database=DATABASE, user=USER, password=PASSWORD)
+        try:
+            writer = asyncio.run(stream_trades_async(conn, max_pages, concurrency, incremental, **kwargs))
+        finally:
+            conn.close()
+        print(f"Pipeline finished in {time.time() - start_time:.2f} seconds.")
+        return writer
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+
+
 def load_tables(trans_list):
-    """Insert new trades into PostgreSQL, skipping duplicates."""
+    """Insert new trades into PostgreSQL; duplicates and invalid rows are skipped."""
     try:
         conn = psycopg2.connect(host=HOST, database=DATABASE, user=USER, password=PASSWORD)
-        conn.autocommit = True
-        cur = conn.cursor()
-
-        # Fetch existing trades once
-        cur.execute("Select purchase_date, stock_symbol, name FROM stock_purchases")
-        existing = {(row[0].isoformat() if isinstance(row[0], date) else row[0], row[1], row[2]) for row in cur.fetchall()}
-        print(f"Found {len(existing)} existing trades. Sample: {list(existing)[:5]}")
-
-        # Filter new trades and prepare batch
-        new_trades = []
-        for t in trans_list:
-            # Normalize purchase_date to match DB format
-            db_date = t.transform_date()
-            if db_date is None:
-                print(f"Skipping invalid date: {t.purchase_date}")
-                continue
-            db_date_str = db_date.isoformat()
-            key = (db_date_str, t.symbol, t.name.strip())
-            print(f"Checking trade: {key}")
-            if key not in existing:
-                new_trades.append((t.purchase_date, t.price, t.symbol, t.name))
-                print(f"Added new trade: {t}")
-            else:
-                print(f"Trade already exists:{t}")
-        
-        print(f"Inserting {len(new_trades)} new trades.")
-        # Batch insert
-        if new_trades:
-            cur.executemany("""
-                INSERT INTO stock_purchases (purchase_date, purchase_price, stock_symbol, name)
-                VALUES (%s, %s, %s, %s)
-            """, new_trades)
-            conn.commit()
-        else:
-            print("No new trades to insert.")
-
-        print(f"Batch inserted {len(new_trades)} trades.")
-
-        # Clean up invalid data
-        cur.execute("DELETE FROM stock_purchases WHERE stock_symbol = 'N/A' or purchase_price IS NULL or name = 'N/A'")
-        print("Cleaned up invalid entries.")
-
-        cur.close()
+        writer = TradeWriter(conn)
+        writer.write(trans_list)
+        writer.close()
         conn.close()
+        print(f"Loaded {len(trans_list)} scraped trades: {writer.summary()}.")
     except psycopg2.Error as e:
         print(f"Database error: {e}")
 
 if __name__ == "__main__":
-    transactions = scrape_trades(max_pages = 60, workers = 5)
-    load_tables(transactions)
\ No newline at end of file
+    # Incremental: stops at the first page with nothing new; rows are written while pages download
+    stream_trades(max_pages = 60, concurrency = 5)
\ No newline at end of file
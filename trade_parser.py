@@ -0,0 +1,124 @@
+import re
+import time
+from functools import partial
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:  # Fall back to BeautifulSoup's pure-Python parser
+    lxml = None
+
+MIN_COLUMNS = 9   # Cells in a trade row
+
+POLITICIAN_RE = re.compile(r"[A-Z][^A-Z]*\s[A-Z][^A-Z]*")
+TICKER_RE = re.compile(r"[A-Z]{1,4}:[A-Z]{2}")
+
+# Tickers the listing renders with a stray leading letter
+TICKER_FIXES = {
+    "OOGL:US": "GOOGL:US",
+    "CACN:US": "ACN:US",
+    "PCEG:US": "CEG:US",
+}
+
+
+def _rows_lxml(html):
+    """Cell texts of every row of the first table, parsed with lxml (libxml2)."""
+    table = lxml.html.fromstring(html).find(".//table")
+    if table is None:
+        return None
+    return [[td.text_content() for td in tr.iterfind(".//td")] for tr in table.iter("tr")][1:]
+
+
+def _rows_bs4(html, builder):
+    """Cell texts of every row of the first table; BeautifulSoup only builds a tree for <table> elements."""
+    table = BeautifulSoup(html, builder, parse_only = SoupStrainer("table")).find("table")
+    if table is None:
+        return None
+    return [[td.text for td in tr.find_all("td")] for tr in table.find_all("tr")][1:]
+
+
+PARSERS = {"html.parser": partial(_rows_bs4, builder = "html.parser")}
+if lxml is not None:
+    PARSERS["bs4-lxml"] = partial(_rows_bs4, builder = "lxml")
+    PARSERS["lxml"] = _rows_lxml
+DEFAULT_PARSER = "lxml" if lxml is not None else "html.parser"
+
+
+def parse_rows(html, parser = None):
+    """
+    Extract (date_full, price, symbol, politician) for each trade row of a listing page.
+
+    parser names one of PARSERS (DEFAULT_PARSER if None). Returns None if
+    the page has no table. date_full is the 'D,Mon,YYYY' string that
+    StockPurchase.transform_date() expects; missing fields become "N/A"
+    (politician, symbol) or None (price).
+    """
+    rows = PARSERS[parser or DEFAULT_PARSER](html)
+    if rows is None:
+        return None
+
+    trades = []
+    for cells in rows:
+        if len(cells) < MIN_COLUMNS:
+            continue
+        politician = POLITICIAN_RE.search(cells[0].strip())
+        stock = TICKER_RE.search(cells[1].strip())
+        stock = stock.group(0) if stock else "N/A"
+
+        # Obtain and format the date and price
+        date_full = cells[3].strip().replace(" ", ",")
+        price = cells[8].strip().replace("$", "").replace(",", "")
+        trades.append((
+            date_full[:-4] + "," + date_full[-4:],
+            float(price) if price and price != "N/A" else None,
+            TICKER_FIXES.get(stock, stock),
+            politician.group(0) if politician else "N/A",
+        ))
+    return trades
+
+
+def fixture_page(page, rows = 12, padding = 200):
+    """
+    Synthetic listing page shaped like Capitol Trades: a nav/script-heavy
+    shell around one trade table with rows trades.
+    """
+    shell = "".join(f'<div class="nav-item"><a href="/x/{i}">Link {i}</a><script>var v{i} = {i};</script></div>' for i in range(padding))
+    trs = []
+    for i in range(rows):
+        n = page * rows + i
+        cells = [
+            f'<div class="politician"><a href="/politicians/{n % 50}">Member Number{n % 50}</a><span>Democrat House CA</span></div>',
+            f'<div class="issuer"><a>Company {n} Inc</a><span>T{chr(65 + n % 26)}{chr(65 + n // 26 % 26)}:US</span></div>',
+            "<div>2024-12-01</div>",
+            f"<div>{1 + n % 28} Oct</div><div>2024</div>",
+            "<div>30</div>", "<div>Spouse</div>", "<div>buy</div>", "<div>1K-15K</div>",
+            f"<div>${100 + n % 400:,}.25</div>",
+        ]
+        trs.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    table = "<table><thead><tr><th>Politician</th></tr></thead><tbody>" + "".join(trs) + "</tbody></table>"
+    return f"<html><head><title>Trades</title></head><body>{shell}{table}{shell}</body></html>"
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: pages/second for each backend on saved pages (argv) or synthetic fixtures
+    import sys
+
+    if len(sys.argv) > 1:
+        pages = []
+        for path in sys.argv[1:]:
+            with open(path, encoding = "utf-8") as f:
+                pages.append(f.read())
+    else:
+        pages = [fixture_page(p) for p in range(20)]
+
+    expected = [parse_rows(html, "html.parser") for html in pages]
+    for name in PARSERS:
+        assert [parse_rows(html, name) for html in pages] == expected, f"{name} disagrees with html.parser"
+        began = time.perf_counter()
+        rounds = 0
+        while time.perf_counter() - began < 2.0:
+            for html in pages:
+                parse_rows(html, name)
+            rounds += 1
+        elapsed = time.perf_counter() - began
+        print(f"{name:<12} {rounds * len(pages) / elapsed:8.1f} pages/s")
@@ -0,0 +1,258 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
+from features import FEATURE_COLUMNS, TARGET_COLUMNS, TARGET_HORIZON
+from registry import input_hash
+
+N_ESTIMATORS = 50
+RANDOM_STATE = 42
+MIN_ROWS = 10
+TEST_SIZE = .2
+
+# Incremental (warm-start) updates
+INCREMENT_TREES = 10     # Trees grown per update
+INCREMENT_WINDOW = 60    # Most recent rows each update's trees are grown on
+MAX_TREES = 200          # Oldest trees are dropped past this size
+DRIFT_TOLERANCE = 0.05   # Allowed accuracy drop versus the last full fit
+DRIFT_MIN_ROWS = 20      # New rows scored before the drift check applies
+
+
+def symbol_jobs(panel):
+    """
+    Split the feature panel into per-symbol training jobs.
+
+    Each job holds only NumPy arrays (features, one target column per
+    horizon, prices), so sending it to a worker process pickles that symbol's
+    data and never the whole frame.
+    """
+    jobs = []
+    for symbol, stock_prices in panel.groupby("stock_symbol", sort = False):
+        if len(stock_prices) < 20:
+            print(f"Skipping {symbol}: insufficient data")
+
+        stock_prices = stock_prices.dropna(subset = TARGET_COLUMNS)
+
+        if len(stock_prices) < MIN_ROWS:
+            print(f"Skipping {symbol}: too few valid rows after preprocessing")
+            continue
+
+        jobs.append((symbol,
+                     stock_prices[FEATURE_COLUMNS].to_numpy(dtype = float),
+                     stock_prices[TARGET_COLUMNS].to_numpy(dtype = int),
+                     stock_prices["s_price"].to_numpy(dtype = float)))
+    return jobs
+
+
+def fit_symbol(job, n_jobs = 1):
+    """
+    Fit and evaluate one symbol's model. Returns (symbol, metrics, model).
+
+    The forest is multi-output, one up/down output per horizon, so a single
+    fit gives direct t+1 ... t+7 forecasts. Metrics are reported for the
+    furthest horizon on the last TEST_SIZE of the rows. The split is
+    chronological, and the TARGET_HORIZON training rows before the test
+    period are purged because their targets look into it.
+    """
+    symbol, X, y, prices = job
+
+    split = len(y) - max(1, int(round(len(y) * TEST_SIZE)))
+    train_end = max(1, split - TARGET_HORIZON)
+    X_train, X_test, y_train, y_test = X[:train_end], X[split:], y[:train_end], y[split:]
+
+    # Train model
+    model = RandomForestClassifier(n_estimators = N_ESTIMATORS, random_state = RANDOM_STATE, n_jobs = n_jobs)
+    model.fit(X_train, y_train)
+
+    # Evaluate the furthest horizon on the test set
+    y_pred = model.predict(X_test)[:, -1]
+    y_test = y_test[:, -1]
+    metrics = {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision_score(y_test, y_pred, zero_division = 0),
+        "recall": recall_score(y_test, y_pred, zero_division = 0),
+        "f1": f1_score(y_test, y_pred, zero_division = 0),
+        "confusion_matrix": confusion_matrix(y_test, y_pred, labels = [0, 1]),
+    }
+
+    # Simulate trading profit: long after an up prediction, short otherwise
+    test_prices = prices[split:]
+    positions = np.where(y_pred[:-1] == 1, 1, -1)
+    metrics["profit"] = float(np.sum(positions * np.diff(test_prices)))
+
+    return symbol, metrics, model
+
+
+def model_params():
+    """Hyperparameters and schema that, with the input rows, determine a fitted model."""
+    return {
+        "model": "RandomForestClassifier",
+        "n_estimators": N_ESTIMATORS,
+        "random_state": RANDOM_STATE,
+        "features": FEATURE_COLUMNS,
+        "targets": TARGET_COLUMNS,
+        "split": "chronological",
+    }
+
+
+def _fit_symbol_star(args):
+    return fit_symbol(*args)
+
+
+def sklearn_jobs(workers, n_jobs = None):
+    """
+    Pick scikit-learn's n_jobs for each fit.
+
+    With n_jobs=None the cores are shared out between the worker processes
+    (cpu_count // workers, at least 1) so processes and tree-building threads
+    do not oversubscribe the machine. An explicit n_jobs is used as given.
+    """
+    if n_jobs is not None:
+        return n_jobs
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def training_state(job, metrics, params):
+    """State saved with a fully fitted model so later runs can update it incrementally."""
+    _, X, y, _ = job
+    return {
+        "mode": "full",
+        "n_rows": len(y),
+        "rows_hash": input_hash((X, y), params),
+        "base_accuracy": metrics["accuracy"],
+        "seen": 0,
+        "correct": 0,
+    }
+
+
+def _has_both_classes(model):
+    """True if every output of a fitted forest has seen both up and down rows."""
+    classes = model.classes_ if getattr(model, "n_outputs_", 1) > 1 else [model.classes_]
+    return all(len(c) == 2 for c in classes)
+
+
+def update_symbol(job, entry, params, n_jobs = 1):
+    """
+    Warm-start a stored forest with the rows that arrived since it was fit.
+
+    The existing model first scores the new rows (prequential accuracy,
+    accumulated across updates). Then INCREMENT_TREES trees are grown on the
+    trailing INCREMENT_WINDOW rows and the oldest trees past MAX_TREES are
+    dropped, so an update costs time proportional to the new data rather
+    than the full history.
+
+    Returns (symbol, metrics, model, state), or None when the stored model
+    cannot be extended (history rewritten, single-class model) or has
+    drifted DRIFT_TOLERANCE below its last full-fit accuracy; the caller
+    then does a full refit.
+    """
+    symbol, X, y, _ = job
+    state = dict(entry.get("state") or {})
+    model = entry["model"]
+    n_rows = state.get("n_rows")
+
+    if not n_rows or n_rows > len(y) or not _has_both_classes(model):
+        return None
+    if input_hash((X[:n_rows], y[:n_rows]), params) != state.get("rows_hash"):
+        return None
+
+    X_new, y_new = X[n_rows:], y[n_rows:]
+    state["seen"] += len(y_new)
+    state["correct"] += int((model.predict(X_new)[:, -1] == y_new[:, -1]).sum())
+    accuracy = state["correct"] / state["seen"] if state["seen"] else state["base_accuracy"]
+    if state["seen"] >= DRIFT_MIN_ROWS and accuracy < state["base_accuracy"] - DRIFT_TOLERANCE:
+        print(f"{symbol}: incremental accuracy {accuracy:.2f} fell below {state['base_accuracy']:.2f}, refitting.")
+        return None
+
+    window = max(len(y_new), INCREMENT_WINDOW)
+    X_recent, y_recent = X[-window:], y[-window:]
+    if all(len(np.unique(column)) == 2 for column in y_recent.T):
+        model.set_params(warm_start = True, n_jobs = n_jobs, n_estimators = len(model.estimators_) + INCREMENT_TREES)
+        model.fit(X_recent, y_recent)
+        if len(model.estimators_) > MAX_TREES:
+            model.estimators_ = model.estimators_[-MAX_TREES:]
+            model.n_estimators = MAX_TREES
+
+    state.update({
+        "mode": "incremental",
+        "n_rows": len(y),
+        "rows_hash": input_hash((X, y), params),
+    })
+    metrics = dict(entry["metrics"], incremental_accuracy = accuracy)
+    return symbol, metrics, model, state
+
+
+def _fit_all(jobs, workers, n_jobs):
+    if workers <= 1 or len(jobs) <= 1:
+        return [fit_symbol(job, n_jobs) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        return list(executor.map(_fit_symbol_star, [(job, n_jobs) for job in jobs]))
+
+
+def train_models(jobs, workers = 1, n_jobs = None, registry = None, incremental = False):
+    """
+    Fit every symbol's model, serially or in a process pool.
+
+    workers > 1 hands the per-symbol jobs to a ProcessPoolExecutor. Results
+    come back in job order either way, and each forest uses a fixed
+    random_state, so the output does not depend on the worker count.
+
+    With a ModelRegistry, symbols whose input rows and hyperparameters hash to
+    a stored entry reuse that model and metrics; only the rest are fitted and
+    then saved. With incremental=True, a symbol whose stored model was trained
+    on a prefix of its current rows is updated with update_symbol() instead
+    of being refit, unless the drift check asks for a full refit.
+    """
+    n_jobs = sklearn_jobs(workers, n_jobs)
+    if registry is None:
+        return _fit_all(jobs, workers, n_jobs)
+
+    params = model_params()
+    results = [None] * len(jobs)
+    digests = {}
+    pending = []
+    updated = 0
+    for i, job in enumerate(jobs):
+        symbol = job[0]
+        digest = input_hash(job[1:], params)
+        entry = registry.load(symbol, digest)
+        if entry is not None:
+            results[i] = (symbol, entry["metrics"], entry["model"])
+            continue
+
+        digests[i] = digest
+        previous = registry.latest(symbol) if incremental else None
+        update = update_symbol(job, previous, params, n_jobs) if previous else None
+        if update is not None:
+            symbol, metrics, model, state = update
+            registry.save(symbol, digest, model, FEATURE_COLUMNS, metrics, params, state)
+            results[i] = (symbol, metrics, model)
+            updated += 1
+        else:
+            pending.append(i)
+
+    cached = len(jobs) - len(pending) - updated
+    print(f"Model registry: {cached} cached, {updated} updated, {len(pending)} to fit.")
+    fitted = _fit_all([jobs[i] for i in pending], workers, n_jobs)
+    for i, (symbol, metrics, model) in zip(pending, fitted):
+        state = training_state(jobs[i], metrics, params)
+        registry.save(symbol, digests[i], model, FEATURE_COLUMNS, metrics, params, state)
+        results[i] = (symbol, metrics, model)
+
+    registry.evict()
+    return results
+
+
+def print_evaluation(symbol, metrics):
+    """Print the evaluation block for one symbol."""
+    print(f"\nEvaluation for {symbol}:")
+    print(f"Accuracy: {metrics['accuracy']:.2f}")
+    print(f"Precision: {metrics['precision']:.2f}")
+    print(f"Recall: {metrics['recall']:.2f}")
+    print(f"F1-Score: {metrics['f1']:.2f}")
+    print(f"Confusion Matrix: \n{metrics['confusion_matrix']}")
+    print(f"Simulated profit for {symbol}: {metrics['profit']:.2f}")
+    if "incremental_accuracy" in metrics:
+        print(f"Incremental accuracy since last full fit: {metrics['incremental_accuracy']:.2f}")